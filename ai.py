@@ -1,12 +1,14 @@
 import logging
 import os
 from functools import lru_cache
-from typing import Any, TypeVar
+from typing import TYPE_CHECKING, Any, TypeVar
 
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
 from pydantic import BaseModel
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -31,11 +33,14 @@ T = TypeVar("T", bound=BaseModel)
 
 
 @lru_cache
-def _get_client() -> AsyncOpenAI:
+def _get_client() -> "AsyncOpenAI":
     """Get cached AsyncOpenAI client configured for OpenRouter."""
     api_key = os.environ.get("OPEN_ROUTER_API_KEY")
     if not api_key:
         raise ValueError("OPEN_ROUTER_API_KEY not found in environment")
+    # The openai SDK takes over half a second to import; defer it until a client is needed.
+    from openai import AsyncOpenAI
+
     return AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=api_key)
 
 
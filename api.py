@@ -10,6 +10,7 @@ from fastapi.responses import Response
 
 from main import run_all_pipelines
 from models import Product
+from parsing import loads_json
 
 # Browser-like User-Agent to reduce CDN blocking
 IMAGE_UA = (
@@ -84,7 +85,7 @@ def get_products():
     """Return all extracted products"""
     output_file = Path("output/products.json")
     if output_file.exists():
-        return json.loads(output_file.read_text())
+        return loads_json(output_file.read_bytes())
     return []
 
 
@@ -5,7 +5,7 @@ This module converts messy HTML into high-signal Markdown by combining
 deterministic metadata extraction with heuristic content distillation.
 
 Pipeline flows as follows:
-1. Deterministic Extraction (BeautifulSoup): Harvest machine-readable 
+1. Deterministic Extraction (lxml): Harvest machine-readable 
    metadata (JSON-LD, OpenGraph) that heuristics may discard.
 2. Heuristic Distillation (Trafilatura): Extract the 'core' product story 
    and specs while stripping navigation, ads, and boilerplate.
@@ -16,13 +16,19 @@ A condensed Markdown and metadata context for token-optimized AI hydration.
 
 from __future__ import annotations
 
+import copy
+import functools
+import html
 import json
 import re
+import sys
 from pathlib import Path
 from urllib.parse import urlparse
 
-from bs4 import BeautifulSoup
-import trafilatura
+from lxml import etree
+from lxml import html as lxml_html
+
+from parsing import loads_json, parse_html
 
 # Helper functions for parsing messy web data
 def _to_list(val):
@@ -46,12 +52,17 @@ def _norm_float(val):
         return None
 
 _HYDRATION_KEYS = ("__SERVER_DATA__", "__INITIAL_STATE__")
+_HYDRATION_RES = tuple(re.compile(rf"window\.{re.escape(key)}\s*=\s*(\{{)") for key in _HYDRATION_KEYS)
+
+# Elements carrying at least one data-* attribute; evaluated by libxml2 in document order.
+_DATA_ATTR_XPATH = etree.XPath("//*[@*[starts-with(name(), 'data-')]]")
+_PRODUCT_ATTR_RE = re.compile(r"product|price|sku|id|image|brand")
 
 def _parse_window_json(raw: str) -> list[dict]:
     """Extract JSON from window.__X__ = {...} in plain scripts."""
     out = []
-    for key in _HYDRATION_KEYS:
-        m = re.search(rf"window\.{re.escape(key)}\s*=\s*(\{{)", raw)
+    for pattern in _HYDRATION_RES:
+        m = pattern.search(raw)
         if not m:
             continue
         start = m.start(1)
@@ -61,7 +72,7 @@ def _parse_window_json(raw: str) -> list[dict]:
             elif c == "}": depth -= 1
             if depth == 0:
                 try:
-                    out.append(json.loads(raw[start : i + 1]))
+                    out.append(loads_json(raw[start : i + 1]))
                 except (json.JSONDecodeError, TypeError):
                     pass
                 break
@@ -85,10 +96,10 @@ def _harvest_product_media(product: dict, out: dict) -> None:
         src = None
         if i < len(media) and isinstance(media[i], dict):
             src = (media[i].get("src") or media[i].get("url")) and str(media[i].get("src") or media[i].get("url", "")).strip()
-        if color and color not in out["colors"]:
-            out["colors"].append(color)
-        if src and src not in out["image_urls"]:
-            out["image_urls"].append(src)
+        if color:
+            out["colors"][color] = None
+        if src:
+            out["image_urls"][src] = None
         out["variants"].append({"sku": None, "color": color or None, "size": None, "price": None, "image_url": src})
 
 def _extract_product_from_embedded(data: dict) -> dict:
@@ -96,7 +107,8 @@ def _extract_product_from_embedded(data: dict) -> dict:
     Extract product-like data from embedded JSON (Next.js, Nuxt, hydration, or heuristic).
     Returns dict with colors, variants, image_urls (only non-empty fields).
     """
-    result: dict = {"colors": [], "variants": [], "image_urls": []}
+    # colors and image_urls are dicts used as ordered sets (value None): O(1) dedupe, first-seen order.
+    result: dict = {"colors": {}, "variants": [], "image_urls": {}}
 
     product = data.get("product")
     if isinstance(product, dict):
@@ -114,7 +126,17 @@ def _extract_product_from_embedded(data: dict) -> dict:
     if not result["colors"] and not result["variants"] and not result["image_urls"]:
         _heuristic_search(data, result, depth=0, max_depth=4)
 
-    return {k: v for k, v in result.items() if v}
+    return {k: list(v) for k, v in result.items() if v}
+
+# Explicit small dimensions in CDN template segments (e.g. t_PDP_144_v1) indicate thumbnails.
+# Avoid matching product IDs like 224626_1176_41 by requiring a "t_" template prefix.
+_SMALL_TEMPLATE_RE = re.compile(r"t_[a-z0-9_]*[_-]?(?:1[0-4][0-9]|[0-5][0-9])(?:[_\-/]|$)")
+# Explicit small dimensions in query params (wid=65, hei=100) indicate thumbnails
+_SMALL_QUERY_RE = re.compile(r"[?&](?:wid|hei|w|h|size)=[0-9]{1,3}(?:[&]|$)")
+# UUID-like segment (e.g. u_9ddf04c7-xxxx-xxxx-xxxx) common in CDN image paths
+_IMAGE_UUID_RE = re.compile(
+    r"[a-z]*_?([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})", re.I
+)
 
 def _resolution_score(url: str) -> int:
     """Higher score = likely higher resolution. Deprioritize thumb/default/small; prefer pdp/large/original.
@@ -125,12 +147,9 @@ def _resolution_score(url: str) -> int:
     score = 0
     if "thumb" in u or "small" in u or "default" in u:
         score -= 1
-    # Explicit small dimensions in CDN template segments (e.g. t_PDP_144_v1) indicate thumbnails.
-    # Avoid matching product IDs like 224626_1176_41 by requiring a "t_" template prefix.
-    if re.search(r"t_[a-z0-9_]*[_-]?(?:1[0-4][0-9]|[0-5][0-9])(?:[_\-/]|$)", u):
+    if _SMALL_TEMPLATE_RE.search(u):
         score -= 2
-    # Explicit small dimensions in query params (wid=65, hei=100) indicate thumbnails
-    if re.search(r"[?&](?:wid|hei|w|h|size)=[0-9]{1,3}(?:[&]|$)", u):
+    if _SMALL_QUERY_RE.search(u):
         score -= 2
     if "pdp" in u or "large" in u or "original" in u or "hero" in u or "full" in u:
         score += 1
@@ -148,12 +167,7 @@ def _image_identity(url: str) -> str | None:
     if not url or not url.strip():
         return None
     path = urlparse(url).path
-    # UUID-like segment (e.g. u_9ddf04c7-xxxx-xxxx-xxxx) common in CDN image paths
-    m = re.search(
-        r"[a-z]*_?([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})",
-        path,
-        re.I,
-    )
+    m = _IMAGE_UUID_RE.search(path)
     if m:
         return m.group(1).lower()
     # Fallback: last non-empty path segment (often filename or id)
@@ -169,8 +183,8 @@ def upgrade_variant_urls(truth_sheet: dict, image_candidates: list[str]) -> None
     candidates = image_candidates or []
     if not variants or not candidates:
         return
-    # Build map: identity -> best candidate URL (by resolution score)
-    id_to_best: dict[str, str] = {}
+    # Build map: identity -> (best candidate URL, its resolution score); each URL is scored once.
+    id_to_best: dict[str, tuple[str, int]] = {}
     for url in candidates:
         if not url or not isinstance(url, str):
             continue
@@ -178,8 +192,8 @@ def upgrade_variant_urls(truth_sheet: dict, image_candidates: list[str]) -> None
         if not ident:
             continue
         score = _resolution_score(url)
-        if ident not in id_to_best or score > _resolution_score(id_to_best[ident]):
-            id_to_best[ident] = url
+        if ident not in id_to_best or score > id_to_best[ident][1]:
+            id_to_best[ident] = (url, score)
     for var in variants:
         if not isinstance(var, dict):
             continue
@@ -189,8 +203,8 @@ def upgrade_variant_urls(truth_sheet: dict, image_candidates: list[str]) -> None
         ident = _image_identity(current)
         if not ident or ident not in id_to_best:
             continue
-        best = id_to_best[ident]
-        if _resolution_score(best) > _resolution_score(current):
+        best, best_score = id_to_best[ident]
+        if best_score > _resolution_score(current):
             var["image_url"] = best
 
 def _best_image_url(cw: dict) -> str | None:
@@ -218,10 +232,10 @@ def _harvest_colorway_images(obj: dict, out: dict) -> None:
             continue
         color = (cw.get("colorDescription") or cw.get("color") or cw.get("name")) and str(cw.get("colorDescription") or cw.get("color") or cw.get("name", "")).strip()
         img = _best_image_url(cw)
-        if color and color not in out["colors"]:
-            out["colors"].append(color)
-        if img and img not in out["image_urls"]:
-            out["image_urls"].append(img)
+        if color:
+            out["colors"][color] = None
+        if img:
+            out["image_urls"][img] = None
         out["variants"].append({
             "sku": cw.get("sku") or cw.get("id") or None,
             "color": color or None,
@@ -244,64 +258,132 @@ def _heuristic_search(obj: dict, out: dict, depth: int, max_depth: int) -> None:
                 _harvest_colorway_images({"colorwayImages": val}, out)
         elif key in ("color", "colorDescription") and val:
             s = str(val).strip()
-            if s and s not in out["colors"]:
-                out["colors"].append(s)
+            if s:
+                out["colors"][s] = None
         elif key in ("image", "images"):
             for u in _to_list(val):
                 u = u if isinstance(u, str) else (u.get("url") or u.get("contentUrl") if isinstance(u, dict) else None)
-                if u and isinstance(u, str) and u.strip() and u not in out["image_urls"]:
-                    out["image_urls"].append(u.strip())
+                if u and isinstance(u, str) and u.strip():
+                    out["image_urls"][u.strip()] = None
         if isinstance(val, dict):
             _heuristic_search(val, out, depth + 1, max_depth)
         elif isinstance(val, list) and val and isinstance(val[0], dict):
             for item in val[:10]:
                 _heuristic_search(item, out, depth + 1, max_depth)
 
-# Pick out the high value metadata before the heuristic distillation process.
-def extract_metadata(html_path: Path) -> dict:
-    """
-    Extract high-certainty machine-readable data (JSON-LD, OpenGraph, Twitter, data-*) using BeautifulSoup. 
-    Returns a dict of metadata.
-    """
-    html_content = html_path.read_text(encoding="utf-8", errors="replace")
-    soup = BeautifulSoup(html_content, "html.parser")
-    output: dict = {
+def _empty_metadata() -> dict:
+    return {
         "json_ld": [],
         "embedded_json": [],
         "meta": {},
         "product_attributes": {},
     }
 
+def _append_json_ld(raw: str | None, json_ld: list) -> None:
+    """Parse one ld+json script body into json_ld; blank or invalid scripts are skipped."""
+    if not raw or not raw.strip():
+        return
+    try:
+        data = loads_json(raw)
+    except (json.JSONDecodeError, TypeError):
+        return
+    # Prevent nested lists if the json-ld data is already a list.
+    if isinstance(data, list):
+        json_ld.extend(data)
+    else:
+        json_ld.append(data)
+
+# Fast path for stereotyped pages whose only metadata is <meta property|name=... content=...> tags
+# and ld+json scripts (common on templated storefronts). Regexes stand in for the DOM, so the
+# page is only accepted when every <meta> and <script> in it is accounted for by a match.
+_FAST_PROBE_LD = b'<script type="application/ld+json">'
+_FAST_PROBE_OG = b'property="og:'
+_FAST_META_RE = re.compile(rb'<meta\s+(?:property|name)="([^"]*)"\s+content="([^"]*)"\s*/?>')
+_FAST_CHARSET_RE = re.compile(rb'<meta\s+charset="?[\w-]+"?\s*/?>')
+_FAST_LD_RE = re.compile(rb'<script type="application/ld\+json">(.*?)</script>', re.S)
+
+def _fastpath_metadata(html_bytes: bytes) -> dict | None:
+    """
+    Regex-only extract_metadata for stereotyped pages; no DOM is built.
+    Returns None whenever the page has anything the regexes might miss (other scripts,
+    data-* attributes, comments, unusual meta markup), so callers fall back to the full parse.
+    """
+    if _FAST_PROBE_LD not in html_bytes[:4096] or _FAST_PROBE_OG not in html_bytes[:8192]:
+        return None
+    lowered = html_bytes.lower()
+    if b"data-" in lowered or b"<!--" in lowered:
+        return None
+    metas = _FAST_META_RE.findall(html_bytes)
+    scripts = _FAST_LD_RE.findall(html_bytes)
+    charsets = len(_FAST_CHARSET_RE.findall(html_bytes))
+    if lowered.count(b"<meta") != len(metas) + charsets or lowered.count(b"<script") != len(scripts):
+        return None
+
+    output = _empty_metadata()
+    for raw in scripts:
+        _append_json_ld(raw.decode("utf-8", errors="replace"), output["json_ld"])
+    meta = output["meta"]
+    for raw_key, raw_content in metas:
+        key = sys.intern(html.unescape(raw_key.decode("utf-8", errors="replace")).strip().lower())
+        if key:
+            meta.setdefault(key, html.unescape(raw_content.decode("utf-8", errors="replace")).strip())
+    return output
+
+# Pick out the high value metadata before the heuristic distillation process.
+def extract_metadata(html_path: Path) -> dict:
+    """
+    Extract high-certainty machine-readable data (JSON-LD, OpenGraph, Twitter, data-*) using lxml. 
+    Returns a dict of metadata.
+    Results are memoized per file version (resolved path, mtime, size); each call gets its own copy.
+    """
+    path = Path(html_path).resolve()
+    st = path.stat()
+    return copy.deepcopy(_cached_metadata(path, st.st_mtime_ns, st.st_size))
+
+@functools.lru_cache(maxsize=64)
+def _cached_metadata(path: Path, mtime_ns: int, size: int) -> dict:
+    """mtime_ns and size only key the cache: any rewrite of the file yields a fresh entry."""
+    return extract_metadata_from_html(path.read_bytes())
+
+def extract_metadata_from_html(html: str | bytes) -> dict:
+    """Same as extract_metadata, for a document already in memory."""
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    fast = _fastpath_metadata(html)
+    if fast is not None:
+        return fast
+    return _metadata_from_html(html)
+
+def _metadata_from_html(html_bytes: bytes) -> dict:
+    """Full DOM pass behind extract_metadata."""
+    return _metadata_from_tree(parse_html(html_bytes))
+
+def _metadata_from_tree(root: lxml_html.HtmlElement | None) -> dict:
+    """Harvest metadata from a parsed document. Read-only, so the tree can be reused afterwards."""
+    output = _empty_metadata()
+    if root is None:
+        # Empty or unparseable document: nothing to harvest.
+        return output
+
     # JSON-LD: highest value machine readable metadata. typically used for SEO for merchant sites.
-    for script in soup.find_all("script", type="application/ld+json"):
-        raw = script.string
-        if not raw or not raw.strip():
-            continue
-        try:
-            data = json.loads(raw)
-            # Prevent nested lists if the json-ld data is already a list.
-            if isinstance(data, list):
-                output["json_ld"].extend(data)
-            else:
-                output["json_ld"].append(data)
-        except (json.JSONDecodeError, TypeError):
-            continue
+    for script in root.iterfind(".//script[@type='application/ld+json']"):
+        _append_json_ld(script.text, output["json_ld"])
 
-    for script in soup.find_all("script", type="application/json"):
-        raw = script.string
+    for script in root.iterfind(".//script[@type='application/json']"):
+        raw = script.text
         if not raw or not raw.strip():
             continue
         try:
-            data = json.loads(raw)
+            data = loads_json(raw)
             if isinstance(data, dict):
                 output["embedded_json"].append(data)
         except (json.JSONDecodeError, TypeError):
             continue
 
-    for script in soup.find_all("script"):
+    for script in root.iter("script"):
         if script.get("type") == "application/json":
             continue
-        raw = script.string
+        raw = script.text
         if not raw or len(raw) < 50:
             continue
         for data in _parse_window_json(raw):
@@ -309,27 +391,24 @@ def extract_metadata(html_path: Path) -> dict:
                 output["embedded_json"].append(data)
 
     # Check for high value tags ie: "og:*", "product:*", "twitter:*", and "name"
-    for tag in soup.find_all("meta"):
-        if "property" not in tag.attrs and "name" not in tag.attrs:
+    # Keys are interned: the same handful of og:/twitter: names repeat across every page.
+    meta = output["meta"]
+    for tag in root.iter("meta"):
+        attrib = tag.attrib
+        key = attrib.get("property") or attrib.get("name")
+        content = attrib.get("content")
+        if key is None or content is None:
             continue
-        key = (tag.get("property") or tag.get("name") or "").strip().lower()
-        content = tag.get("content")
-        if key and content is not None and key not in output["meta"]:
-            output["meta"][key] = content.strip()
+        key = sys.intern(key.strip().lower())
+        if key:
+            meta.setdefault(key, content.strip())
     
-    # Check all tags for common data-* attributes, a convention used by ecommerce sites that may contain product data.
-    for tag in soup.find_all(True):
-        if not any(cur_key.startswith("data-") for cur_key in tag.attrs):
-            continue
-        for key, val in tag.attrs.items():
+    # Check tags with data-* attributes, a convention used by ecommerce sites that may contain product data.
+    # The XPath pre-selects candidate elements so we never visit attribute maps of plain tags.
+    for tag in _DATA_ATTR_XPATH(root):
+        for key, val in tag.attrib.items():
             # iterate through the attributes in the tag for relevant content
-            if not key.startswith("data-") or val is None:
-                continue
-            cur_key = key.lower()
-            if any(
-                x in cur_key
-                for x in ("product", "price", "sku", "id", "image", "brand")
-            ):
+            if key.startswith("data-") and _PRODUCT_ATTR_RE.search(key.lower()):
                 output["product_attributes"][key] = str(val)
     
     return output
@@ -340,11 +419,18 @@ def extract_distilled_content(html_path: Path) -> str:
     Extract main content as Markdown using Trafilatura (Reader Mode heuristics). 
     Returns markdown-formatted string.
     """
-    html_content = html_path.read_text(encoding="utf-8", errors="replace")
-    if not html_content.strip():
+    return _distilled_from_tree(parse_html(html_path.read_bytes()))
+
+def _distilled_from_tree(root: lxml_html.HtmlElement | None) -> str:
+    """Run Trafilatura on an already-parsed document (it works on its own copy of the tree)."""
+    if root is None:
         return ""
+    # Imported lazily: trafilatura (and its justext/htmldate stack) costs ~150ms and noticeable
+    # memory at import, which metadata-only callers should not pay.
+    import trafilatura
+
     result = trafilatura.extract(
-        html_content,
+        root,
         output_format="markdown",
         include_links=True,
         include_images=True,
@@ -353,6 +439,29 @@ def extract_distilled_content(html_path: Path) -> str:
     )
     return result or ""
 
+def extract_all(html_path: Path) -> tuple[dict, str]:
+    """
+    Metadata and distilled Markdown from a single read and a single parse of the file.
+    Equivalent to (extract_metadata(p), extract_distilled_content(p)) without parsing twice.
+    Results are memoized per file version (resolved path, mtime, size); each call gets its own
+    copy of the metadata.
+    """
+    path = Path(html_path).resolve()
+    st = path.stat()
+    meta, md = _cached_extract_all(path, st.st_mtime_ns, st.st_size)
+    return copy.deepcopy(meta), md
+
+@functools.lru_cache(maxsize=64)
+def _cached_extract_all(path: Path, mtime_ns: int, size: int) -> tuple[dict, str]:
+    """mtime_ns and size only key the cache: any rewrite of the file yields a fresh entry."""
+    data = path.read_bytes()
+    root = parse_html(data)
+    # Trafilatura always needs the tree; metadata skips walking it when the regex fast path accepts the page.
+    meta = _fastpath_metadata(data)
+    if meta is None:
+        meta = _metadata_from_tree(root)
+    return meta, _distilled_from_tree(root)
+
 # Stage 1: Contextual Anchoring
 # Extracts high-fidelity deterministic data (JSON-LD) to anchor the AI hydration stage.
 # Adheres to Schema.org standards to ensure cross-merchant compatibility.
@@ -361,8 +470,7 @@ def get_hybrid_context(html_path: Path) -> dict:
     Unified entrypoint for stage 1 of pipeline.
     Returns a dict with 'truth_sheet', 'md_content', and 'product_json_ld'
     """
-    raw_meta = extract_metadata(html_path)
-    md_content = extract_distilled_content(html_path)
+    raw_meta, md_content = extract_all(html_path)
 
     # Extract the relevant data from the json_ld. eCommerce conventions dictate that the "@type" value will be "Products".
     # NB: Truth sheet will be filled following the conventions outlined on https://schema.org/Product.
@@ -433,6 +541,7 @@ def get_hybrid_context(html_path: Path) -> dict:
 
     # image_urls: from JSON-LD (fallback when Verified Media is empty or sparse)
     imgs = json_ld.get("images") or json_ld.get("image")
+    seen_urls: set[str] = set()
     for u in _to_list(imgs):
         if isinstance(u, str):
             u = u.strip() if u else None
@@ -441,7 +550,8 @@ def get_hybrid_context(html_path: Path) -> dict:
             u = raw.strip() if isinstance(raw, str) else None
         else:
             u = str(u).strip() if u is not None else None
-        if u and u not in truth_sheet["image_urls"]:
+        if u and u not in seen_urls:
+            seen_urls.add(u)
             truth_sheet["image_urls"].append(u)
     if not truth_sheet["image_urls"] and json_ld.get("image"):
         u = json_ld["image"]
@@ -510,8 +620,10 @@ def get_hybrid_context(html_path: Path) -> dict:
         if not truth_sheet["image_urls"] and extracted.get("image_urls"):
             truth_sheet["image_urls"] = extracted["image_urls"]
         elif extracted.get("image_urls"):
+            seen = set(truth_sheet["image_urls"])
             for u in extracted["image_urls"]:
-                if u and u not in truth_sheet["image_urls"]:
+                if u and u not in seen:
+                    seen.add(u)
                     truth_sheet["image_urls"].append(u)
     truth_sheet["image_urls"] = _drop_non_product_urls(truth_sheet["image_urls"])
 
@@ -9,18 +9,24 @@ Responsibilities:
 from __future__ import annotations
 
 import asyncio
+import functools
 import io
 import logging
 import json
 import re
+import struct
+import threading
+import weakref
 from pathlib import Path
 from typing import TYPE_CHECKING, Optional, Tuple
 
 import aiohttp
-from PIL import Image
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, uses_params
 
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
+
+from parsing import loads_json, new_html_parser, parse_html
 
 if TYPE_CHECKING:
     from models import Product
@@ -29,48 +35,92 @@ if TYPE_CHECKING:
 # Product-quality criteria per plan: ~1:1 aspect, both sides ≥ 1000px, valid image types.
 MIN_SIDE = 1000
 ASPECT_LOW, ASPECT_HIGH = 0.8, 1.25  # aspect ratio tolerance around 1:1
-VALID_IMAGE_TYPES = {"jpeg", "jpg", "png", "webp"}
+VALID_IMAGE_TYPES: frozenset[str] = frozenset({"jpeg", "jpg", "png", "webp"})
+
+# Compiled once; each selects only elements that can contribute a candidate URL.
+_IMG_XPATH = etree.XPath(
+    "//img[@src or @data-src or @data-lazy-src or @data-original or @srcset or @data-srcset]"
+)
+_META_XPATH = etree.XPath("//meta[@content != ''][@property or @name]")
+_LD_JSON_XPATH = etree.XPath("//script[@type='application/ld+json']")
+# Extraction reads only attributes and script bodies, so whitespace-only text is never built either.
+_HTML_PARSER = new_html_parser(remove_blank_text=True)
 
 
 # --- Helpers functions --- 
+
+# Substrings that make urljoin rewrite a URL rather than append it: dot and empty path
+# segments, stripped tabs/newlines, and empty params/query/fragment markers it drops.
+_JOIN_REWRITES = ("/.", "//", "\t", "\r", "\n", ";", "?#")
+_URL_CONTROL_CHARS = ("\t", "\r", "\n")
+
+
+def _base_origin(base: str) -> Optional[str]:
+    """scheme://authority of an http(s) base URL, or None when urljoin must handle it."""
+    if not base.startswith(("http://", "https://")) or any(c in base for c in _URL_CONTROL_CHARS):
+        return None
+    start = base.index("//") + 2
+    end = len(base)
+    for sep in "/?#":
+        i = base.find(sep, start)
+        if i != -1 and i < end:
+            end = i
+    return base[:end] if end > start else None
+
+
 def _normalize_url(url: str, base: Optional[str]) -> str:
     url = (url or "").strip()
     if not url:
         return ""
     if base and not url.startswith(("http://", "https://", "//")):
+        # Root-relative paths (the common case) only need the base origin; anything urljoin
+        # would rewrite (dot segments, empty segments, embedded tabs/newlines) goes through it.
+        if (
+            url[0] == "/"
+            and not url.endswith(("?", "#"))
+            and not any(c in url for c in _JOIN_REWRITES)
+        ):
+            origin = _base_origin(base)
+            if origin is not None:
+                return origin + url
         return urljoin(base, url)
     if url.startswith("//"):
         return "https:" + url
     return url
 
-def _parse_best_from_srcset(srcset_str: str) -> str | None:
-    if not srcset_str:
+@functools.lru_cache(maxsize=1024)
+def _resolve_candidate(raw_url: str, base: Optional[str]) -> Optional[str]:
+    """
+    Normalized absolute URL for a candidate, or None when it is not http(s) or has no path.
+    Cached because pages repeat the same URLs across img, meta and JSON-LD.
+    """
+    url = _normalize_url(raw_url, base)
+    if not url.startswith(("http://", "https://", "//")):
         return None
-    candidates = []
-    for entry in srcset_str.split(','):
-        parts = entry.strip().split()
-        if not parts:
-            continue
-        url = parts[0].strip()
-        if not url:
-            continue
-
-        score = 0        
-        if len(parts) > 1:
-            descriptor = parts[1].lower()
-            # Extract digits from '1200w' or '2x'
-            nums = re.findall(r'\d+', descriptor)
-            if nums:
-                score = int(nums[0])
-        
-        candidates.append({"url": url, "score": score})
-
-    if not candidates:
+    if not _url_path(url).strip("/"):
         return None
+    return url
 
-    # Sort by score descending; among ties, first in srcset is kept.
-    best = sorted(candidates, key=lambda x: x['score'], reverse=True)[0]
-    return best["url"]
+# One srcset candidate: URL, optional descriptor token, then anything else up to the next comma.
+_SRCSET_ENTRY_RE = re.compile(r"([^\s,]+)(?:\s+([^\s,]+))?[^,]*")
+_DIGITS_RE = re.compile(r"\d+")
+
+def _parse_best_from_srcset(srcset_str: str) -> str | None:
+    if not srcset_str:
+        return None
+    best_url, best_score = None, -1
+    for m in _SRCSET_ENTRY_RE.finditer(srcset_str):
+        # Score is the first run of digits in the descriptor ('1200w' -> 1200, '2x' -> 2); none -> 0.
+        descriptor = m.group(2)
+        digits = _DIGITS_RE.search(descriptor) if descriptor else None
+        score = int(digits.group()) if digits else 0
+        # Strictly greater: among ties, first in srcset is kept.
+        if score > best_score:
+            best_url, best_score = m.group(1), score
+    return best_url
+
+# Resolution-specific filename suffixes stripped to find an image's base identity.
+_RESOLUTION_SUFFIX_RE = re.compile(r'[-_](\d+x\d+|thumb|small|medium|max|large|original)', re.IGNORECASE)
 
 def _dedupe_images(urls: list[str]) -> list[str]:
     """
@@ -84,10 +134,7 @@ def _dedupe_images(urls: list[str]) -> list[str]:
     for url in urls:
             # Strip query params and resolution-specific suffixes
             base = url.split("?")[0]
-            identity = re.sub(
-                r'[-_](\d+x\d+|thumb|small|medium|max|large|original)', 
-                '', base, flags=re.IGNORECASE
-            )
+            identity = _RESOLUTION_SUFFIX_RE.sub('', base)
             # Prioritize the version with the longest URL (likely containing higher-res markers)
             if identity not in best_candidates or len(url) > len(best_candidates[identity]):
                 best_candidates[identity] = url
@@ -95,23 +142,64 @@ def _dedupe_images(urls: list[str]) -> list[str]:
 
 # --- Image processing ---
 
+# Chunk size for feeding files to the incremental parser.
+_PARSE_CHUNK_SIZE = 64 * 1024
+
+
+def _parse_html_file(html_path: Path) -> lxml_html.HtmlElement | None:
+    """
+    Parse an HTML file by feeding raw byte chunks to lxml; None when empty or unparseable.
+    The document is never held in full as bytes or str, only as the tree being built.
+    """
+    # Feed parsers are stateful, so each file gets its own instead of the shared _HTML_PARSER.
+    parser = new_html_parser(remove_blank_text=True)
+    with html_path.open("rb") as f:
+        while chunk := f.read(_PARSE_CHUNK_SIZE):
+            parser.feed(chunk)
+    try:
+        return parser.close()
+    except etree.XMLSyntaxError:
+        return None
+
+
 def _collect_image_urls_and_metadata(
     html_path: Path, base_url: Optional[str] = None
 ) -> tuple[list[str], dict[str, str]]:
     """
-    Single-pass HTML traversal to collect:
-      - candidate image URLs
-      - lightweight per-image hints (alt text, meta source, json-ld origin)
+    Read and parse an HTML file, then collect image candidates and hints from it.
 
     Public helpers `extract_image_urls` and `extract_image_metadata` build on top
     of this to keep responsibilities clear and the API small.
+    Results are memoized per file version (resolved path, mtime, size) and base URL; each call gets its own copies.
     """
-    html_content = html_path.read_text(encoding="utf-8", errors="replace")
-    soup = BeautifulSoup(html_content, "html.parser")
+    path = Path(html_path).resolve()
+    st = path.stat()
+    urls, hints = _cached_collect(path, st.st_mtime_ns, st.st_size, base_url)
+    return list(urls), dict(hints)
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_collect(
+    path: Path, mtime_ns: int, size: int, base_url: Optional[str]
+) -> tuple[list[str], dict[str, str]]:
+    """mtime_ns and size only key the cache: any rewrite of the file yields a fresh entry."""
+    return _collect_from_tree(_parse_html_file(path), base_url=base_url)
+
+
+def _collect_from_tree(
+    root: lxml_html.HtmlElement | None, base_url: Optional[str] = None
+) -> tuple[list[str], dict[str, str]]:
+    """
+    Single-pass traversal of a parsed document to collect:
+      - candidate image URLs
+      - lightweight per-image hints (alt text, meta source, json-ld origin)
+    """
+    if root is None:
+        return ([], {})
     base = base_url
     if not base:
-        base_tag = soup.find("base", attrs={"href": True})
-        if base_tag:
+        base_tag = root.find(".//base[@href]")
+        if base_tag is not None:
             base = base_tag.get("href")
 
     seen: set[str] = set()
@@ -120,25 +208,18 @@ def _collect_image_urls_and_metadata(
 
     def add_url(raw_url: str) -> Optional[str]:
         """Normalize and register a URL, returning the normalized value or None."""
-        url = _normalize_url(raw_url, base)
-        if not url.startswith(("http://", "https://", "//")):
-            return None
-        if not urlparse(url).path.strip("/"):
+        url = _resolve_candidate(raw_url, base)
+        if url is None:
             return None
         if url not in seen:
             seen.add(url)
             urls.append(url)
         return url
 
-    def add_hint(raw_url: str, label: str) -> None:
-        """Attach a human-ish label to a URL for LLM reasoning."""
+    def add_hint(url: str, label: str) -> None:
+        """Attach a human-ish label to a URL already accepted by add_url, for LLM reasoning."""
         if not label:
             return
-        url = _normalize_url(raw_url, base)
-        if not url.startswith(("http://", "https://", "//")):
-            return
-        if not urlparse(url).path.strip("/"):
-            return
         label = label.strip()
         if not label:
             return
@@ -149,7 +230,7 @@ def _collect_image_urls_and_metadata(
             hints[url] = f"{prev}; {label}"
 
     # <img> tags: collect URLs plus alt-text hints when available.
-    for img in soup.find_all("img"):
+    for img in _IMG_XPATH(root):
         alt_text = img.get("alt") or ""
         for attr in ("src", "data-src", "data-lazy-src", "data-original"):
             img_url = img.get(attr)
@@ -169,7 +250,7 @@ def _collect_image_urls_and_metadata(
                     add_hint(normalized, alt_text)
 
     # Meta tags: og:image / twitter:image
-    for meta in soup.find_all("meta"):
+    for meta in _META_XPATH(root):
         key = (meta.get("property") or meta.get("name") or "").strip().lower()
         if key in ("og:image", "og:image:secure_url", "twitter:image"):
             img_url = meta.get("content")
@@ -179,12 +260,14 @@ def _collect_image_urls_and_metadata(
                     add_hint(normalized, key)
 
     # JSON-LD images: also mark as coming from structured data.
-    for script in soup.find_all("script", type="application/ld+json"):
-        raw = script.string
-        if not raw or not raw.strip():
+    for script in _LD_JSON_XPATH(root):
+        raw = script.text
+        # Only top-level "image"/"images" keys are read, so blobs that never mention them
+        # (breadcrumbs, organisation, search boxes) are skipped without a JSON parse.
+        if not raw or '"image' not in raw:
             continue
         try:
-            data = json.loads(raw)
+            data = loads_json(raw)
             if isinstance(data, list):
                 items = [x for x in data if isinstance(x, dict)]
             elif isinstance(data, dict):
@@ -220,42 +303,239 @@ def _collect_image_urls_and_metadata(
 
     return (urls, hints)
 
+def extract_image_urls(html_path: Path, base_url: Optional[str] = None) -> list[str]:
+    """Candidate image URLs from HTML (img, srcset, meta, JSON-LD): absolute, deduplicated, in page order."""
+    urls, _ = _collect_image_urls_and_metadata(html_path, base_url=base_url)
+    return urls
+
+
+def extract_image_urls_from_html(html: str | bytes, base_url: Optional[str] = None) -> list[str]:
+    """Same as extract_image_urls, for a document already in memory."""
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    urls, _ = _collect_from_tree(parse_html(html, _HTML_PARSER), base_url=base_url)
+    return urls
+
+
+def extract_image_metadata(html_path: Path, base_url: Optional[str] = None) -> dict[str, str]:
+    """Per-URL hints (alt text, meta key, JSON-LD origin) for the candidates from extract_image_urls."""
+    _, hints = _collect_image_urls_and_metadata(html_path, base_url=base_url)
+    return hints
+
 # --- Async image filtering ---
 
 logger = logging.getLogger(__name__)
 
-# Bytes to fetch for header-based dimension checks (enough for JPEG/PNG/WebP/GIF headers).
+# Bytes to fetch for header-based dimension checks. The probe covers PNG/GIF/WebP and most
+# JPEGs; the wider window is fetched once when metadata pushes the size past the probe.
+_HEADER_PROBE_SIZE = 2 * 1024
 _HEADER_READ_SIZE = 64 * 1024
+# Connection pool bounds for dimension checks, shared by every batch in the process;
+# each batch is further capped by its own max_concurrent.
+_MAX_CONNECTIONS = 1024
+_MAX_PER_HOST = 64
+_KEEPALIVE_SECONDS = 60
+_DNS_TTL_SECONDS = 600
+# Header reads are small, so a stalled connect or read is abandoned quickly.
+_IMAGE_FETCH_TIMEOUT = aiohttp.ClientTimeout(total=5, connect=2, sock_read=3)
+
+# Long-lived sessions so keep-alive connections and DNS entries survive across batches.
+# aiohttp sessions are bound to the loop they were created on, so each running loop gets its own;
+# an entry goes away with its loop. The lock covers loops running in different threads.
+_sessions: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession] = (
+    weakref.WeakKeyDictionary()
+)
+_sessions_lock = threading.Lock()
+
+
+def _shared_session() -> aiohttp.ClientSession:
+    """The image-check session for the running loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    with _sessions_lock:
+        session = _sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=_MAX_CONNECTIONS,
+                limit_per_host=_MAX_PER_HOST,
+                keepalive_timeout=_KEEPALIVE_SECONDS,
+                ttl_dns_cache=_DNS_TTL_SECONDS,
+            )
+            session = _sessions[loop] = aiohttp.ClientSession(
+                connector=connector, timeout=_IMAGE_FETCH_TIMEOUT
+            )
+    return session
+
+
+async def close_image_session() -> None:
+    """Close the running loop's image-check session; call once the pipeline run is finished."""
+    with _sessions_lock:
+        session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
 
 
+_SCHEME_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789+-.")
+# Cleanup urlsplit applies before splitting: leading C0 controls and spaces are stripped, and
+# tab/CR/LF are removed anywhere in the URL.
+_C0_CONTROL_OR_SPACE = "".join(map(chr, range(0x21)))
+_DROP_TAB_CR_LF = str.maketrans("", "", "\t\r\n")
+
+
+def _url_path(url: str) -> str:
+    """
+    Path component of a URL, as urlparse(url).path would return it, using plain str scans.
+    Skips building a ParseResult for per-candidate hot-path checks.
+    """
+    if url[:1] <= " ":
+        url = url.lstrip(_C0_CONTROL_OR_SPACE)
+    if "\t" in url or "\r" in url or "\n" in url:
+        url = url.translate(_DROP_TAB_CR_LF)
+    if url.startswith("https://"):
+        scheme, start = "https", 6
+    elif url.startswith("http://"):
+        scheme, start = "http", 5
+    else:
+        scheme, start = "", 0
+        colon = url.find(":")
+        if colon > 0 and url[0].isascii() and url[0].isalpha() and _SCHEME_CHARS.issuperset(url[:colon]):
+            scheme, start = url[:colon].lower(), colon + 1
+    end = len(url)
+    for sep in ("?", "#"):
+        i = url.find(sep, start, end)
+        if i != -1:
+            end = i
+    if url.startswith("//", start):
+        # Skip the authority; the path starts at the next "/" (if any).
+        start = url.find("/", start + 2, end)
+        if start == -1:
+            return ""
+    # urlparse splits ";params" off the last path segment for these schemes.
+    if scheme in uses_params:
+        semi = url.find(";", max(url.rfind("/", start, end), start), end)
+        if semi != -1:
+            end = semi
+    return url[start:end]
+
+
+@functools.lru_cache(maxsize=4096)
 def _is_valid_image_type(url: str) -> bool:
-    """Check URL path extension is in VALID_IMAGE_TYPES."""
-    path = urlparse(url).path.lower()
-    ext = path.rsplit(".", 1)[-1] if "." in path else ""
-    return ext in VALID_IMAGE_TYPES
+    """Check URL path extension is in VALID_IMAGE_TYPES. Cached: gallery URLs recur across calls."""
+    _, dot, ext = _url_path(url).rpartition(".")
+    return bool(dot) and ext.lower() in VALID_IMAGE_TYPES
 
 
 def _passes_quality(w: int, h: int) -> bool:
     """True if both sides ≥ MIN_SIDE and aspect in [ASPECT_LOW, ASPECT_HIGH]."""
-    if w < MIN_SIDE or h < MIN_SIDE:
-        return False
-    aspect = w / h if h else 0
-    return ASPECT_LOW <= aspect <= ASPECT_HIGH
+    # Aspect bounds scaled by h instead of dividing: no zero-height guard needed, since
+    # h >= MIN_SIDE has already short-circuited for h == 0.
+    return w >= MIN_SIDE and h >= MIN_SIDE and ASPECT_LOW * h <= w <= ASPECT_HIGH * h
+
+
+# JPEG start-of-frame markers (SOF0-SOF15 minus DHT, JPG and DAC), which carry the frame size.
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _sniff_jpeg_dims(data: bytes) -> Optional[Tuple[int, int]]:
+    """Walk JPEG marker segments to the first SOF; None if it lies beyond the bytes we have."""
+    i, n = 2, len(data)
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # Fill byte before a marker.
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # Standalone markers have no length.
+            i += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 9 > n:
+                return None
+            h, w = struct.unpack_from(">HH", data, i + 5)
+            return (w, h) if w and h else None
+        i += 2 + struct.unpack_from(">H", data, i + 2)[0]
+    return None
+
+
+def _sniff_dims(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read (width, height) straight from fixed header offsets for PNG, GIF and WebP, and from
+    the first start-of-frame segment for JPEG.
+    Returns None for other formats or truncated headers so the caller can fall back to PIL.
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and data[12:16] == b"IHDR" and len(data) >= 24:
+        return struct.unpack_from(">II", data, 16)
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack_from("<HH", data, 6)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 " and data[23:26] == b"\x9d\x01\x2a":
+            w, h = struct.unpack_from("<HH", data, 26)
+            return (w & 0x3FFF, h & 0x3FFF)
+        if chunk == b"VP8L" and data[20] == 0x2F:
+            bits = int.from_bytes(data[21:25], "little")
+            return ((bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+        if chunk == b"VP8X":
+            return (int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1)
+    if data[:3] == b"\xff\xd8\xff":
+        return _sniff_jpeg_dims(data)
+    return None
+
+
+def _dims_from_header(data: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from leading image bytes via fixed offsets, then PIL; None if neither can tell."""
+    dims = _sniff_dims(data)
+    if dims is not None:
+        return dims
+    # PIL is only needed for formats _sniff_dims cannot read; import it on first use.
+    from PIL import Image
+
+    try:
+        width, height = Image.open(io.BytesIO(data)).size
+    except Exception:
+        return None
+    return (width, height)
+
+
+async def _fetch_header(session: aiohttp.ClientSession, url: str, size: int) -> Optional[bytes]:
+    """
+    Leading `size` bytes of the resource (fewer only when the body is shorter),
+    or None on a non-success status.
+    """
+    # Servers that ignore Range answer 200 with the full body, of which we still read `size` bytes.
+    async with session.get(url, headers={"Range": f"bytes=0-{size - 1}"}) as resp:
+        if resp.status not in (200, 206):
+            return None
+        # read(n) returns what is buffered so far, so keep reading until `size` bytes or EOF;
+        # otherwise a header split across TCP segments looks like a short body.
+        chunks: list[bytes] = []
+        remaining = size
+        while remaining > 0:
+            chunk = await resp.content.read(remaining)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
 
 
 async def _get_img_dims(session: aiohttp.ClientSession, url: str) -> Optional[Tuple[int, int]]:
     """
-    Fetch enough bytes to read image dimensions via PIL. No quality checks or judgements are made yet.
+    Fetch the leading header bytes (HTTP Range) to read image dimensions, from fixed header
+    offsets when possible and via PIL otherwise. No quality checks or judgements are made yet.
     Return (width, height) or None on failure.
     """
     try:
-        async with session.get(url) as resp:
-            if resp.status != 200:
-                return None
-            data = await resp.content.read(_HEADER_READ_SIZE)
-        img = Image.open(io.BytesIO(data))
-        width, height = img.size
-        return (width, height)
+        data = await _fetch_header(session, url, _HEADER_PROBE_SIZE)
+        if data is None:
+            return None
+        dims = _dims_from_header(data)
+        if dims is None and len(data) >= _HEADER_PROBE_SIZE:
+            # A full probe that still can't be read is usually a header pushed back by metadata
+            # (e.g. a JPEG carrying an EXIF thumbnail); retry once with the wider window.
+            data = await _fetch_header(session, url, _HEADER_READ_SIZE)
+            dims = _dims_from_header(data) if data else None
+        return dims
     except Exception as e:
         logger.debug("Image dimension retrieval failed for %s: '%s'.", url, e)
         return None
@@ -264,34 +544,48 @@ async def _get_img_dims(session: aiohttp.ClientSession, url: str) -> Optional[Tu
 async def filter_image_urls(
     urls: list[str],
     *,
-    max_concurrent: int = 10,
+    max_concurrent: int = 32,
 ) -> list[str]:
     """
     Async filter candidate URLs to product-quality images:
     both sides ≥ MIN_SIDE, aspect in [ASPECT_LOW, ASPECT_HIGH], valid image types.
+    Duplicate URLs are checked once and returned once, in first-seen order.
+    At most max_concurrent checks are in flight per call; the loop's shared connection pool
+    caps all calls on that loop together at _MAX_CONNECTIONS, _MAX_PER_HOST per host.
     """
-    img_urls = [url for url in urls if _is_valid_image_type(url)]
+    # Dedupe and extension-filter in one pass before any task or session exists, so repeated
+    # URLs cost one network check and a batch with no candidates costs no network at all.
+    seen: set[str] = set()
+    img_urls = [
+        url for url in urls
+        if url not in seen and not seen.add(url) and _is_valid_image_type(url)
+    ]
     if not img_urls:
         return []
 
     sem = asyncio.Semaphore(max_concurrent)
+    keep = [False] * len(img_urls)
 
-    async def check(session: aiohttp.ClientSession, url: str) -> Optional[str]:
-        async with sem:
-            dims = await _get_img_dims(session, url)
-        
-        if dims and _passes_quality(dims[0], dims[1]):
-            return url
-        return None
-
-    async def run() -> list[str]:
-        async with aiohttp.ClientSession() as session:
-            # Fire all checks concurrently; order of results matches order of img_urls candidates.
-            results = await asyncio.gather(*[check(session, url) for url in img_urls])
-        # Drop failures and non–product-quality images (None).
-        return [r for r in results if r is not None]
+    async def check(session: aiohttp.ClientSession, i: int, url: str) -> None:
+        # Only the fetch holds a slot; each image is judged as soon as its check finishes and
+        # recorded by index, so results come back in candidate order.
+        try:
+            async with sem:
+                dims = await _get_img_dims(session, url)
+        except Exception as e:
+            # Caught here so one unexpected failure cannot cancel the rest of the task group.
+            logger.debug("Image check failed for %s: '%s'.", url, e)
+            return
+        keep[i] = bool(dims) and _passes_quality(dims[0], dims[1])
 
-    return await run()
+    # Shared pooled session: connections (and DNS lookups) are reused across images on the
+    # same CDN, and across batches, instead of paying a TCP/TLS handshake per URL.
+    session = _shared_session()
+    async with asyncio.TaskGroup() as tg:
+        for i, url in enumerate(img_urls):
+            tg.create_task(check(session, i, url))
+    # Drop failures (exceptions, unreadable images) and non–product-quality images.
+    return [url for url, ok in zip(img_urls, keep) if ok]
 
 
 # Case-insensitive; edit here to add/remove. Used so we never fetch or pass these to the model.
@@ -306,10 +600,11 @@ def _drop_non_product_urls(
     blocklist = blocklist or NON_PRODUCT_PATH_SUBSTRINGS
     if not urls:
         return []
+    needles = [sub.lower() for sub in blocklist]
     kept = []
     for u in urls:
-        path = (urlparse(u).path or "").lower()
-        if not any(sub.lower() in path for sub in blocklist):
+        path = _url_path(u).lower()
+        if not any(sub in path for sub in needles):
             kept.append(u)
     return kept
 
@@ -326,7 +621,11 @@ async def get_filtered_media(html_path: Path, base_url: Optional[str] = None) ->
         candidates: All URLs that passed the path filter, before dimension check. Passed to the LLM
                     so it can reason over them when verified is empty (e.g. og:image that failed fetch).
     """
-    candidate_urls, metadata_by_url = _collect_image_urls_and_metadata(html_path, base_url=base_url)
+    # Parsing is CPU-bound; run it on a worker thread so concurrent pipelines keep their
+    # network checks and LLM calls moving while this page is parsed.
+    candidate_urls, metadata_by_url = await asyncio.to_thread(
+        _collect_image_urls_and_metadata, html_path, base_url
+    )
     candidate_urls = _drop_non_product_urls(candidate_urls)
     candidate_urls = _dedupe_images(candidate_urls)
     if not candidate_urls:
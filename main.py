@@ -7,7 +7,7 @@ from pathlib import Path
 from pydantic import ValidationError
 
 from html_parser import get_hybrid_context, upgrade_variant_urls
-from image_processor import get_filtered_media
+from image_processor import close_image_session, get_filtered_media
 from models import Product, DEFAULT_PRODUCT
 
 ai_instructions = """
@@ -128,7 +128,10 @@ async def run_pipeline(html_path: str):
 
 async def run_all_pipelines(html_paths: list[str]):
     tasks = [run_pipeline(path) for path in html_paths]
-    return await asyncio.gather(*tasks, return_exceptions=True)
+    try:
+        return await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await close_image_session()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run product extraction pipeline on data/*.html")
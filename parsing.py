@@ -0,0 +1,60 @@
+"""
+Parsing primitives shared by html_parser, image_processor and api.
+
+Kept free of pipeline imports so every module can depend on it without import cycles.
+"""
+
+from __future__ import annotations
+
+import json
+
+from lxml import etree
+from lxml import html as lxml_html
+
+try:
+    import orjson
+except ImportError:  # Optional speedup (see the "speedups" extra); stdlib json is used otherwise.
+    orjson = None
+
+
+def loads_json(raw: str | bytes):
+    """Parse JSON text, preferring orjson. Falls back to stdlib json, which also accepts
+    NaN/Infinity and arbitrarily large integers that orjson rejects."""
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
+
+
+def new_html_parser(*, remove_blank_text: bool = False) -> lxml_html.HTMLParser:
+    """
+    lxml HTML parser that never builds comments, processing instructions or the id index.
+    The defaults are the settings trafilatura uses for its own parse, so one tree can serve both
+    metadata extraction and distillation without changing what trafilatura sees.
+    remove_blank_text also drops whitespace-only text, for callers that read only attributes and
+    script bodies. Feed (incremental) parsing is stateful, so each fed document needs its own
+    instance from here.
+    """
+    return lxml_html.HTMLParser(
+        collect_ids=False,
+        default_doctype=False,
+        encoding="utf-8",
+        remove_blank_text=remove_blank_text,
+        remove_comments=True,
+        remove_pis=True,
+    )
+
+
+_HTML_PARSER = new_html_parser()
+
+
+def parse_html(
+    html_bytes: bytes, parser: lxml_html.HTMLParser | None = None
+) -> lxml_html.HtmlElement | None:
+    """Parse a document (with the shared parser unless one is given); None when it is empty or unparseable."""
+    try:
+        return lxml_html.document_fromstring(html_bytes, parser=parser or _HTML_PARSER)
+    except (etree.ParserError, ValueError):
+        return None
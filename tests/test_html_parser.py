@@ -2,10 +2,21 @@
 Happy-path tests for html_parser using sample HTML files in data/.
 """
 
+import os
+import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
-from html_parser import get_hybrid_context
+from html_parser import (
+    extract_all,
+    extract_distilled_content,
+    extract_metadata,
+    extract_metadata_from_html,
+    get_hybrid_context,
+    upgrade_variant_urls,
+)
+from html_parser import _fastpath_metadata, _metadata_from_html  # Private; fast path must match the DOM pass
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 
@@ -120,3 +131,147 @@ class TestHtmlParserHappyPath(unittest.TestCase):
         self.assertGreaterEqual(len(variants), 1)
         self.assertEqual(variants[0]["sku"], "10280550")
         self.assertEqual(variants[0]["price"], 170.0)
+
+    def test_extract_all_matches_single_shot_functions(self) -> None:
+        """extract_all (one parse) returns the same as extract_metadata + extract_distilled_content."""
+        path = DATA_DIR / "ace.html"
+        meta, md = extract_all(path)
+        self.assertEqual(meta, extract_metadata(path))
+        self.assertEqual(md, extract_distilled_content(path))
+        self.assertTrue(md)
+
+
+class TestExtractMetadata(unittest.TestCase):
+    """extract_metadata on small inline documents, parsed in memory."""
+
+    def _extract(self, html: str) -> dict:
+        return extract_metadata_from_html(html)
+
+    def test_product_data_attributes_harvested(self) -> None:
+        """Only data-* attributes naming product fields are collected."""
+        out = self._extract("""<!DOCTYPE html><html><body>
+        <div data-product-sku="SKU-1" data-tracking="nav" class="x"></div>
+        <span data-price="19.99" title="price"></span>
+        <p data-layout="grid">no product attrs</p>
+        </body></html>""")
+        self.assertEqual(
+            out["product_attributes"],
+            {"data-product-sku": "SKU-1", "data-price": "19.99"},
+        )
+
+    def test_meta_first_wins_and_requires_content(self) -> None:
+        """First occurrence of a meta key wins; keys are lowercased; tags without content are skipped."""
+        out = self._extract("""<!DOCTYPE html><html><head>
+        <meta property="og:title" content=" First "/>
+        <meta property="OG:TITLE" content="Second"/>
+        <meta name="description"/>
+        <meta name="twitter:card" content="summary"/>
+        </head><body></body></html>""")
+        self.assertEqual(out["meta"], {"og:title": "First", "twitter:card": "summary"})
+
+    def test_results_cached_per_file_version(self) -> None:
+        """Repeat calls return equal private copies; rewriting the file invalidates the entry."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "page.html"
+            path.write_text('<html><head><meta property="og:title" content="One"/></head></html>', encoding="utf-8")
+            first = extract_metadata(path)
+            first["meta"]["og:title"] = "mutated"
+            with patch("html_parser.extract_metadata_from_html") as parse:
+                self.assertEqual(extract_metadata(path)["meta"], {"og:title": "One"})
+            parse.assert_not_called()
+
+            path.write_text('<html><head><meta property="og:title" content="Second"/></head></html>', encoding="utf-8")
+            self.assertEqual(extract_metadata(path)["meta"], {"og:title": "Second"})
+
+    def test_empty_document_returns_empty_sections(self) -> None:
+        """An empty file yields the empty metadata shape instead of raising."""
+        out = self._extract("")
+        self.assertEqual(
+            out, {"json_ld": [], "embedded_json": [], "meta": {}, "product_attributes": {}}
+        )
+
+
+class TestExtractAll(unittest.TestCase):
+    """extract_all memoizes per file version, keyed on the resolved path."""
+
+    def test_results_cached_per_file_version(self) -> None:
+        """Repeat calls return equal private copies; rewriting the file invalidates the entry."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "page.html"
+            path.write_text('<html><head><meta property="og:title" content="One"/></head></html>', encoding="utf-8")
+            first, _ = extract_all(path)
+            first["meta"]["og:title"] = "mutated"
+            self.assertEqual(extract_all(path)[0]["meta"], {"og:title": "One"})
+
+            path.write_text('<html><head><meta property="og:title" content="Second"/></head></html>', encoding="utf-8")
+            self.assertEqual(extract_all(path)[0]["meta"], {"og:title": "Second"})
+
+    def test_relative_and_absolute_paths_share_an_entry(self) -> None:
+        """Different spellings of one file hit the same cache entry."""
+        path = DATA_DIR / "article.html"
+        relative = Path(os.path.relpath(path))
+        extract_all(path)
+        with patch("html_parser.parse_html") as parse:
+            extract_all(relative)
+        parse.assert_not_called()
+
+
+class TestMetadataFastPath(unittest.TestCase):
+    """_fastpath_metadata accepts only pages it can extract exactly like the full DOM pass."""
+
+    STEREOTYPED = b"""<!DOCTYPE html><html><head>
+<meta charset="utf-8">
+<script type="application/ld+json">{"@type": "Product", "name": "Tee", "offers": {"price": "20"}}</script>
+<meta property="og:title" content="Tee &amp; Co"/>
+<meta property="og:image" content="https://example.com/tee.jpg"/>
+<meta name="Description" content=" Soft cotton tee "/>
+<meta property="og:title" content="Ignored duplicate"/>
+</head><body><h1>Tee</h1></body></html>"""
+
+    def test_stereotyped_page_matches_full_parse(self) -> None:
+        fast = _fastpath_metadata(self.STEREOTYPED)
+        self.assertIsNotNone(fast)
+        self.assertEqual(fast, _metadata_from_html(self.STEREOTYPED))
+        self.assertEqual(fast["meta"]["og:title"], "Tee & Co")
+
+    def test_falls_back_when_page_has_other_sources(self) -> None:
+        """Extra scripts, data-* attributes, or comments force the DOM path."""
+        for extra in (
+            b'<script src="app.js"></script>',
+            b'<div data-product-id="1"></div>',
+            b'<!-- <meta property="og:title" content="hidden"/> -->',
+            b'<META NAME="robots" CONTENT="index">',
+        ):
+            with self.subTest(extra=extra):
+                page = self.STEREOTYPED.replace(b"<h1>", extra + b"<h1>")
+                self.assertIsNone(_fastpath_metadata(page))
+
+    def test_extract_all_uses_fast_path(self) -> None:
+        """The pipeline entrypoint takes the fast path too, and never walks the tree for metadata."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "page.html"
+            path.write_bytes(self.STEREOTYPED)
+            with patch("html_parser._metadata_from_tree") as tree_walk:
+                meta, _ = extract_all(path)
+            tree_walk.assert_not_called()
+        self.assertEqual(meta, _metadata_from_html(self.STEREOTYPED))
+
+
+class TestUpgradeVariantUrls(unittest.TestCase):
+    """upgrade_variant_urls swaps in the highest-scoring candidate sharing a variant's image identity."""
+
+    def test_best_scoring_candidate_replaces_lower_resolution(self) -> None:
+        uuid = "9ddf04c7-1111-2222-3333-444455556666"
+        truth = {"variants": [
+            {"image_url": f"https://cdn.example.com/t_PDP_144_v1/u_{uuid}.jpg"},
+            {"image_url": "https://cdn.example.com/other.jpg"},
+        ]}
+        upgrade_variant_urls(truth, [
+            f"https://cdn.example.com/t_default/u_{uuid}.jpg",
+            f"https://cdn.example.com/t_web_pdp_1080/u_{uuid}.jpg",
+            f"https://cdn.example.com/t_pdp/u_{uuid}.jpg",
+        ])
+        self.assertEqual(
+            [v["image_url"] for v in truth["variants"]],
+            [f"https://cdn.example.com/t_web_pdp_1080/u_{uuid}.jpg", "https://cdn.example.com/other.jpg"],
+        )
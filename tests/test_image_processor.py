@@ -1,7 +1,8 @@
 """
 Tests for image_processor: URL extraction and async image filtering.
 
-Covers extract_image_urls (HTML → candidate URLs), _is_valid_image_type, _passes_quality,
+Covers extract_image_urls / extract_image_urls_from_html (HTML → candidate URLs; the in-memory
+variant keeps extraction tests free of temp files), _is_valid_image_type, _passes_quality,
 _get_img_dims (header-based dimension fetch), and filter_image_urls (async orchestration).
 
 Test status (aligned with image_processor.py):
@@ -13,29 +14,41 @@ Test status (aligned with image_processor.py):
     bounds would fail. If a test fails, see the assertion message and line for where/why.
 """
 
+import asyncio
+import io
 import json
 import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch
+from urllib.parse import urlparse
 
 import aiohttp
+from aiohttp import web
+from PIL import Image
 
 from image_processor import (
     ASPECT_HIGH,
     ASPECT_LOW,
     MIN_SIDE,
     VALID_IMAGE_TYPES,
+    close_image_session,
     extract_image_urls,
+    extract_image_urls_from_html,
     filter_image_urls,
 )
+from image_processor import _drop_non_product_urls
 from image_processor import _get_img_dims  # Private; tested for TDD
 from image_processor import _is_valid_image_type
 from image_processor import _passes_quality
+from image_processor import _sniff_dims
+from image_processor import _url_path
 
 
-def _write_html(path: Path, html: str) -> None:
-    path.write_text(html, encoding="utf-8", errors="replace")
+def _html_with_imgs(*img_attrs: str) -> str:
+    """Minimal document with one <img> per attribute string, e.g. 'src="https://x.com/a.jpg"'."""
+    imgs = "\n".join(f"<img {attrs}/>" for attrs in img_attrs)
+    return f"<!DOCTYPE html><html><body>\n{imgs}\n</body></html>"
 
 
 # --- Extract Image URLs (implemented) ---
@@ -48,93 +61,49 @@ class TestExtractImageUrls(unittest.TestCase):
 
     def test_empty_html_returns_empty_list(self) -> None:
         """No img/meta/JSON-LD yields empty list."""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write("<!DOCTYPE html><html><head></head><body></body></html>")
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertEqual(out, [])
-        finally:
-            path.unlink(missing_ok=True)
+        out = extract_image_urls_from_html("<!DOCTYPE html><html><head></head><body></body></html>")
+        self.assertEqual(out, [])
 
     def test_img_src_extracted(self) -> None:
         """<img src="..."> URLs are extracted."""
-        html = """<!DOCTYPE html><html><body>
-        <img src="https://example.com/product.jpg"/>
-        </body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertIn("https://example.com/product.jpg", out)
-        finally:
-            path.unlink(missing_ok=True)
+        html = _html_with_imgs('src="https://example.com/product.jpg"')
+        out = extract_image_urls_from_html(html)
+        self.assertIn("https://example.com/product.jpg", out)
 
     def test_img_data_src_and_lazy_attrs_extracted(self) -> None:
         """data-src, data-lazy-src, data-original are extracted."""
-        html = """<!DOCTYPE html><html><body>
-        <img data-src="https://example.com/a.jpg"/>
-        <img data-lazy-src="https://example.com/b.jpg"/>
-        <img data-original="https://example.com/c.jpg"/>
-        </body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertIn("https://example.com/a.jpg", out)
-            self.assertIn("https://example.com/b.jpg", out)
-            self.assertIn("https://example.com/c.jpg", out)
-        finally:
-            path.unlink(missing_ok=True)
+        html = _html_with_imgs(
+            'data-src="https://example.com/a.jpg"',
+            'data-lazy-src="https://example.com/b.jpg"',
+            'data-original="https://example.com/c.jpg"',
+        )
+        out = extract_image_urls_from_html(html)
+        self.assertIn("https://example.com/a.jpg", out)
+        self.assertIn("https://example.com/b.jpg", out)
+        self.assertIn("https://example.com/c.jpg", out)
 
     def test_img_srcset_best_url_selected(self) -> None:
         """srcset: highest descriptor (w or x) is chosen; only that URL appears (no small)."""
-        html = """<!DOCTYPE html><html><body>
-        <img srcset="https://example.com/small.jpg 400w, https://example.com/large.jpg 1200w"/>
-        </body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertIn(
-                "https://example.com/large.jpg",
-                out,
-                "Highest descriptor (1200w) must be the chosen URL.",
-            )
-            self.assertNotIn(
-                "https://example.com/small.jpg",
-                out,
-                "Only one URL per srcset (the best); small.jpg must not appear.",
-            )
-        finally:
-            path.unlink(missing_ok=True)
+        html = _html_with_imgs(
+            'srcset="https://example.com/small.jpg 400w, https://example.com/large.jpg 1200w"'
+        )
+        out = extract_image_urls_from_html(html)
+        self.assertIn(
+            "https://example.com/large.jpg",
+            out,
+            "Highest descriptor (1200w) must be the chosen URL.",
+        )
+        self.assertNotIn(
+            "https://example.com/small.jpg",
+            out,
+            "Only one URL per srcset (the best); small.jpg must not appear.",
+        )
 
     def test_img_data_srcset_extracted(self) -> None:
         """data-srcset is parsed like srcset."""
-        html = """<!DOCTYPE html><html><body>
-        <img data-srcset="https://example.com/x.jpg 2x"/>
-        </body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertIn("https://example.com/x.jpg", out)
-        finally:
-            path.unlink(missing_ok=True)
+        html = _html_with_imgs('data-srcset="https://example.com/x.jpg 2x"')
+        out = extract_image_urls_from_html(html)
+        self.assertIn("https://example.com/x.jpg", out)
 
     def test_meta_og_image_twitter_image_extracted(self) -> None:
         """og:image, og:image:secure_url, twitter:image from meta tags."""
@@ -143,18 +112,10 @@ class TestExtractImageUrls(unittest.TestCase):
         <meta property="og:image:secure_url" content="https://example.com/og-secure.png"/>
         <meta name="twitter:image" content="https://example.com/twitter.gif"/>
         </head><body></body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertIn("https://example.com/og.png", out)
-            self.assertIn("https://example.com/og-secure.png", out)
-            self.assertIn("https://example.com/twitter.gif", out)
-        finally:
-            path.unlink(missing_ok=True)
+        out = extract_image_urls_from_html(html)
+        self.assertIn("https://example.com/og.png", out)
+        self.assertIn("https://example.com/og-secure.png", out)
+        self.assertIn("https://example.com/twitter.gif", out)
 
     def test_json_ld_image_string_extracted(self) -> None:
         """JSON-LD "image": "url" is extracted."""
@@ -162,16 +123,8 @@ class TestExtractImageUrls(unittest.TestCase):
         html = f"""<!DOCTYPE html><html><head>
         <script type="application/ld+json">{json.dumps(ld)}</script>
         </head><body></body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertIn("https://example.com/product.webp", out)
-        finally:
-            path.unlink(missing_ok=True)
+        out = extract_image_urls_from_html(html)
+        self.assertIn("https://example.com/product.webp", out)
 
     def test_json_ld_image_object_with_url_extracted(self) -> None:
         """JSON-LD "image": {"@type": "ImageObject", "url": "..."} is extracted."""
@@ -179,16 +132,8 @@ class TestExtractImageUrls(unittest.TestCase):
         html = f"""<!DOCTYPE html><html><head>
         <script type="application/ld+json">{json.dumps(ld)}</script>
         </head><body></body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertIn("https://example.com/obj.jpg", out)
-        finally:
-            path.unlink(missing_ok=True)
+        out = extract_image_urls_from_html(html)
+        self.assertIn("https://example.com/obj.jpg", out)
 
     def test_json_ld_images_list_extracted(self) -> None:
         """JSON-LD "images": [url, ImageObject, ...] each URL is extracted."""
@@ -202,33 +147,28 @@ class TestExtractImageUrls(unittest.TestCase):
         html = f"""<!DOCTYPE html><html><head>
         <script type="application/ld+json">{json.dumps(ld)}</script>
         </head><body></body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertIn("https://example.com/1.png", out)
-            self.assertIn("https://example.com/2.png", out)
-        finally:
-            path.unlink(missing_ok=True)
+        out = extract_image_urls_from_html(html)
+        self.assertIn("https://example.com/1.png", out)
+        self.assertIn("https://example.com/2.png", out)
 
     def test_base_url_resolves_relative_img_src(self) -> None:
         """base_url parameter resolves relative img src."""
-        html = """<!DOCTYPE html><html><body>
-        <img src="/images/product.jpg"/>
-        </body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path, base_url="https://example.com/")
-            self.assertIn("https://example.com/images/product.jpg", out)
-        finally:
-            path.unlink(missing_ok=True)
+        html = _html_with_imgs('src="/images/product.jpg"')
+        out = extract_image_urls_from_html(html, base_url="https://example.com/")
+        self.assertIn("https://example.com/images/product.jpg", out)
+
+    def test_root_relative_src_resolves_against_base_origin(self) -> None:
+        """Root-relative paths replace the base path; dot segments are still normalized."""
+        html = _html_with_imgs('src="/images/a.jpg?v=2"', 'src="/images/../b.jpg"', 'src="c.jpg"')
+        out = extract_image_urls_from_html(html, base_url="https://example.com/shop/item?id=1")
+        self.assertEqual(
+            out,
+            [
+                "https://example.com/images/a.jpg?v=2",
+                "https://example.com/b.jpg",
+                "https://example.com/shop/c.jpg",
+            ],
+        )
 
     def test_base_tag_in_html_used_when_no_base_url_param(self) -> None:
         """<base href="..."> is used when base_url not provided."""
@@ -237,35 +177,17 @@ class TestExtractImageUrls(unittest.TestCase):
         </head><body>
         <img src="product.png"/>
         </body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertIn("https://shop.com/product.png", out)
-        finally:
-            path.unlink(missing_ok=True)
+        out = extract_image_urls_from_html(html)
+        self.assertIn("https://shop.com/product.png", out)
 
     def test_protocol_relative_url_normalized(self) -> None:
         """//example.com/img.png is normalized to https://example.com/img.png."""
-        html = """<!DOCTYPE html><html><body>
-        <img src="//cdn.example.com/img.jpg"/>
-        </body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertTrue(
-                any("https://" in u and "cdn.example.com/img.jpg" in u for u in out),
-                f"Expected protocol-relative URL normalized; got {out}",
-            )
-        finally:
-            path.unlink(missing_ok=True)
+        html = _html_with_imgs('src="//cdn.example.com/img.jpg"')
+        out = extract_image_urls_from_html(html)
+        self.assertTrue(
+            any("https://" in u and "cdn.example.com/img.jpg" in u for u in out),
+            f"Expected protocol-relative URL normalized; got {out}",
+        )
 
     def test_duplicate_urls_deduplicated(self) -> None:
         """Same URL from multiple sources appears once."""
@@ -274,55 +196,27 @@ class TestExtractImageUrls(unittest.TestCase):
         </head><body>
         <img src="https://example.com/same.jpg"/>
         </body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertEqual(out.count("https://example.com/same.jpg"), 1)
-        finally:
-            path.unlink(missing_ok=True)
+        out = extract_image_urls_from_html(html)
+        self.assertEqual(out.count("https://example.com/same.jpg"), 1)
 
     def test_relative_url_without_base_excluded(self) -> None:
         """Relative URLs that cannot be resolved are excluded (no base)."""
-        html = """<!DOCTYPE html><html><body>
-        <img src="relative/path.jpg"/>
-        </body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            # Unresolved relative URLs should not be in output
-            self.assertFalse(any(not u.startswith("http") for u in out))
-        finally:
-            path.unlink(missing_ok=True)
+        html = _html_with_imgs('src="relative/path.jpg"')
+        out = extract_image_urls_from_html(html)
+        # Unresolved relative URLs should not be in output
+        self.assertFalse(any(not u.startswith("http") for u in out))
 
     def test_empty_path_urls_excluded(self) -> None:
         """URLs with empty path (e.g. protocol only) are excluded."""
-        html = """<!DOCTYPE html><html><body>
-        <img src="https://example.com"/>
-        </body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            # Contract: path.strip("/") is falsy for "https://example.com", so URL must not be added.
-            self.assertNotIn(
-                "https://example.com",
-                out,
-                "Empty-path URL must be excluded; add() requires non-empty path.",
-            )
-            self.assertEqual(out, [], "No other images in HTML; output must be empty.")
-        finally:
-            path.unlink(missing_ok=True)
+        html = _html_with_imgs('src="https://example.com"')
+        out = extract_image_urls_from_html(html)
+        # Contract: path.strip("/") is falsy for "https://example.com", so URL must not be added.
+        self.assertNotIn(
+            "https://example.com",
+            out,
+            "Empty-path URL must be excluded; add() requires non-empty path.",
+        )
+        self.assertEqual(out, [], "No other images in HTML; output must be empty.")
 
     def test_file_not_found_raises(self) -> None:
         """Missing HTML file raises FileNotFoundError."""
@@ -336,16 +230,42 @@ class TestExtractImageUrls(unittest.TestCase):
         <script type="application/ld+json">{ invalid }</script>
         <script type="application/ld+json">{"image": "https://example.com/ok.jpg"}</script>
         </head><body></body></html>"""
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".html", delete=False, encoding="utf-8"
-        ) as f:
-            f.write(html)
-            path = Path(f.name)
-        try:
-            out = extract_image_urls(path)
-            self.assertIn("https://example.com/ok.jpg", out)
-        finally:
-            path.unlink(missing_ok=True)
+        out = extract_image_urls_from_html(html)
+        self.assertIn("https://example.com/ok.jpg", out)
+
+
+class TestExtractImageUrlsFromFile(unittest.TestCase):
+    """extract_image_urls on files: the chunked file parse must match the in-memory parse."""
+
+    def setUp(self) -> None:
+        # Per-test directory removed automatically, like pytest's tmp_path.
+        self.tmp_path = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def test_large_file_matches_in_memory_parse(self) -> None:
+        """A document spanning many read chunks yields the same URLs as parsing it whole."""
+        filler = "<p>" + "x" * 1000 + "</p>\n"
+        html = _html_with_imgs(*(f'src="https://example.com/{i}.jpg" alt="{filler}"' for i in range(300)))
+        path = self.tmp_path / "large.html"
+        path.write_text(html, encoding="utf-8")
+        out = extract_image_urls(path)
+        self.assertEqual(len(out), 300)
+        self.assertEqual(out, extract_image_urls_from_html(html))
+
+    def test_empty_file_returns_empty_list(self) -> None:
+        path = self.tmp_path / "empty.html"
+        path.write_bytes(b"")
+        self.assertEqual(extract_image_urls(path), [])
+
+    def test_results_cached_per_file_version(self) -> None:
+        """Repeat calls return equal private copies; rewriting the file invalidates the entry."""
+        path = self.tmp_path / "page.html"
+        path.write_text(_html_with_imgs('src="https://example.com/one.jpg"'), encoding="utf-8")
+        first = extract_image_urls(path)
+        first.append("https://example.com/mutated.jpg")
+        self.assertEqual(extract_image_urls(path), ["https://example.com/one.jpg"])
+
+        path.write_text(_html_with_imgs('src="https://example.com/second.jpg"'), encoding="utf-8")
+        self.assertEqual(extract_image_urls(path), ["https://example.com/second.jpg"])
 
 
 # --- _is_valid_image_type ---
@@ -398,6 +318,31 @@ class TestIsValidImageType(unittest.TestCase):
         """Path like image.tar.gz -> ext is gz (not in valid types)."""
         self.assertFalse(_is_valid_image_type("https://example.com/image.tar.gz"))
 
+    def test_extension_read_from_path_only(self) -> None:
+        """Host names, params and query values never supply the extension."""
+        self.assertFalse(_is_valid_image_type("https://cdn.example.jpg"))
+        self.assertFalse(_is_valid_image_type("https://example.com/image?format=.png"))
+        self.assertTrue(_is_valid_image_type("https://example.com/image.jpg;v=2"))
+        self.assertTrue(_is_valid_image_type("//cdn.example.com/a/image.webp"))
+
+    def test_dot_in_directory_or_trailing_slash_rejected(self) -> None:
+        """Only the final path segment carries the extension."""
+        self.assertFalse(_is_valid_image_type("https://example.com/v1.2/image"))
+        self.assertFalse(_is_valid_image_type("https://example.com/image.jpg/"))
+
+    def test_whitespace_cleaned_like_urlparse(self) -> None:
+        """Leading controls/spaces are stripped and tab/CR/LF removed anywhere, as urlsplit does."""
+        for url in (
+            "https://example.com/image.jp\ng",
+            " \x00https://example.com/image.png",
+            "https://example.com/ban\r\nner/a.jpg",
+            "ht\ttps://cdn.example.jpg",
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(_url_path(url), urlparse(url).path)
+        self.assertTrue(_is_valid_image_type("https://example.com/image.jp\ng"))
+        self.assertEqual(_drop_non_product_urls(["https://example.com/ban\nner.jpg"]), [])
+
 
 # --- _passes_quality ---
 
@@ -460,6 +405,10 @@ class TestFilterImageUrls(unittest.IsolatedAsyncioTestCase):
     Uses _get_img_dims for dimensions; filters by _is_valid_image_type and _passes_quality.
     """
 
+    async def asyncTearDown(self) -> None:
+        # The shared session is bound to this test's loop; close it before the loop goes away.
+        await close_image_session()
+
     async def test_empty_input_returns_empty(self) -> None:
         """Empty URL list returns [] without network calls."""
         result = await filter_image_urls([])
@@ -519,6 +468,88 @@ class TestFilterImageUrls(unittest.IsolatedAsyncioTestCase):
                 "Failed dimension fetch must exclude URL; cannot pass through None.",
             )
 
+    async def test_unexpected_error_skips_only_that_url(self) -> None:
+        """An exception escaping one dimension check drops that URL; the rest of the batch survives."""
+        async def dims(session, url):
+            if "broken" in url:
+                raise RuntimeError("boom")
+            return (1200, 1200)
+
+        with patch("image_processor._get_img_dims", side_effect=dims):
+            urls = ["https://example.com/a.jpg", "https://example.com/broken.jpg", "https://example.com/b.png"]
+            result = await filter_image_urls(urls)
+        self.assertEqual(result, ["https://example.com/a.jpg", "https://example.com/b.png"])
+
+    async def test_result_order_independent_of_completion_order(self) -> None:
+        """Results follow input order even when later URLs finish their checks first."""
+        async def dims(session, url):
+            await asyncio.sleep(0.01 if url.endswith("first.jpg") else 0)
+            return (1200, 1200)
+
+        with patch("image_processor._get_img_dims", side_effect=dims):
+            urls = ["https://example.com/first.jpg", "https://example.com/second.jpg"]
+            result = await filter_image_urls(urls)
+        self.assertEqual(result, urls)
+
+    async def test_session_shared_across_calls_until_closed(self) -> None:
+        """Batches on one loop reuse a single ClientSession; closing it makes the next call start fresh."""
+        sessions = []
+
+        async def dims(session, url):
+            sessions.append(session)
+            return None
+
+        with patch("image_processor._get_img_dims", side_effect=dims):
+            await filter_image_urls(["https://example.com/a.jpg"])
+            await filter_image_urls(["https://example.com/b.jpg"])
+            self.assertIs(sessions[0], sessions[1])
+            await close_image_session()
+            self.assertTrue(sessions[0].closed)
+            await filter_image_urls(["https://example.com/c.jpg"])
+        self.assertIsNot(sessions[2], sessions[0])
+
+    async def test_concurrent_loops_keep_their_own_sessions(self) -> None:
+        """Batches running at once on two loops each fetch over their own session; neither is cut off."""
+        png = io.BytesIO()
+        Image.new("RGB", (1200, 1200)).save(png, format="PNG")
+        both_in_flight = asyncio.Event()
+        requests = 0
+
+        async def handler(request: web.Request) -> web.Response:
+            nonlocal requests
+            requests += 1
+            if requests == 2:
+                both_in_flight.set()
+            # Hold each response until both loops have a request open.
+            await asyncio.wait_for(both_in_flight.wait(), timeout=5)
+            return web.Response(body=png.getvalue(), content_type="image/png")
+
+        app = web.Application()
+        app.router.add_get("/product.png", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        try:
+            port = runner.addresses[0][1]
+            url = f"http://127.0.0.1:{port}/product.png"
+
+            async def other_loop_batch() -> list[str]:
+                try:
+                    return await filter_image_urls([url])
+                finally:
+                    await close_image_session()
+
+            other, here = await asyncio.gather(
+                asyncio.to_thread(asyncio.run, other_loop_batch()),
+                filter_image_urls([url]),
+            )
+        finally:
+            await runner.cleanup()
+        self.assertEqual(other, [url])
+        self.assertEqual(here, [url])
+        self.assertEqual(requests, 2)
+
     async def test_max_concurrent_respected(self) -> None:
         """All candidate URLs get a dimension check; result order preserved; no crash."""
         with patch(
@@ -526,7 +557,7 @@ class TestFilterImageUrls(unittest.IsolatedAsyncioTestCase):
             new_callable=AsyncMock,
             return_value=(600, 600),
         ) as mock_dims:
-            urls = ["https://example.com/a.jpg", "https://example.com/b.png"] * 5
+            urls = [f"https://example.com/{i}.{'jpg' if i % 2 else 'png'}" for i in range(10)]
             result = await filter_image_urls(urls, max_concurrent=2)
             self.assertEqual(len(result), 10, "All 10 have valid ext and pass quality.")
             # Each candidate must be passed to _get_img_dims (semaphore limits concurrency internally).
@@ -536,79 +567,192 @@ class TestFilterImageUrls(unittest.IsolatedAsyncioTestCase):
                 "Each of 10 URLs must be checked; if this fails, the loop or semaphore may be wrong.",
             )
 
+    async def test_duplicate_urls_checked_once(self) -> None:
+        """Repeated URLs trigger a single dimension check and appear once, in first-seen order."""
+        with patch(
+            "image_processor._get_img_dims",
+            new_callable=AsyncMock,
+            return_value=(MIN_SIDE, MIN_SIDE),
+        ) as mock_dims:
+            urls = ["https://example.com/a.jpg", "https://example.com/b.png"] * 5
+            result = await filter_image_urls(urls)
+            self.assertEqual(result, ["https://example.com/a.jpg", "https://example.com/b.png"])
+            self.assertEqual(mock_dims.await_count, 2)
+
 
 # --- _get_img_dims ---
 
+# Minimal valid 1x1 PNG (signature + IHDR + IDAT + IEND) so PIL can open and read .size
+_PNG_1X1 = (
+    b"\x89PNG\r\n\x1a\n"
+    b"\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x02\x00\x00\x00\x90wS\xde"
+    b"\x00\x00\x00\x0cIDATx\x9cc\xf8\xcf\xc0\x00\x00\x03\x01\x01\x00\xc9\xfe\x92\xef"
+    b"\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+
+class _FakeContent:
+    """
+    Body stream that is consumed as it is read, ending with b"" at EOF. With chunk_size set,
+    read(n) returns at most that many bytes, like aiohttp handing back only what is buffered.
+    """
+
+    __slots__ = ("_body", "_pos", "_chunk_size")
+
+    def __init__(self, body: bytes, chunk_size: int | None = None) -> None:
+        self._body = body
+        self._pos = 0
+        self._chunk_size = chunk_size
+
+    async def read(self, n: int = -1) -> bytes:
+        if self._chunk_size is not None:
+            n = self._chunk_size if n < 0 else min(n, self._chunk_size)
+        end = len(self._body) if n < 0 else self._pos + n
+        chunk = self._body[self._pos:end]
+        self._pos += len(chunk)
+        return chunk
+
+
+class _FakeResp:
+    """Stand-in for an aiohttp response used as `async with session.get(...) as resp`."""
+
+    __slots__ = ("status", "content")
+
+    def __init__(self, status: int, body: bytes = b"", chunk_size: int | None = None) -> None:
+        self.status = status
+        self.content = _FakeContent(body, chunk_size)
+
+    async def __aenter__(self) -> "_FakeResp":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+
+class _FakeSession:
+    """Replays queued responses (or raises queued exceptions) and records each request's headers."""
+
+    def __init__(self, *responses: _FakeResp | BaseException) -> None:
+        self._responses = list(responses)
+        self.requests: list[tuple[str, dict]] = []
+
+    def get(self, url: str, headers: dict | None = None, **kwargs) -> _FakeResp:
+        self.requests.append((url, headers or {}))
+        resp = self._responses.pop(0)
+        if isinstance(resp, BaseException):
+            raise resp
+        return resp
+
 
 class TestCheckSingleImage(unittest.IsolatedAsyncioTestCase):
     """
     _get_img_dims: Fetches header bytes and returns (width, height) or None.
-    Implementation uses session.get(url), then resp.content.read(_HEADER_READ_SIZE), then PIL.
+    Implementation uses session.get(url) with a small Range probe, header sniffing, then PIL,
+    and one wider Range request when a full probe cannot be read.
     """
 
     async def test_returns_dims_for_valid_image_bytes(self) -> None:
         """When response body contains valid image header, return (width, height)."""
-        # Minimal valid 1x1 PNG (signature + IHDR + IDAT + IEND) so PIL can open and read .size
-        png_1x1 = (
-            b"\x89PNG\r\n\x1a\n"
-            b"\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x02\x00\x00\x00\x90wS\xde"
-            b"\x00\x00\x00\x0cIDATx\x9cc\xf8\xcf\xc0\x00\x00\x03\x01\x01\x00\xc9\xfe\x92\xef"
-            b"\x00\x00\x00\x00IEND\xaeB`\x82"
-        )
-        mock_resp = AsyncMock()
-        mock_resp.status = 200
-        mock_resp.content = MagicMock()
-        mock_resp.content.read = AsyncMock(return_value=png_1x1)
-        mock_resp.__aenter__ = AsyncMock(return_value=mock_resp)
-        mock_resp.__aexit__ = AsyncMock(return_value=None)
-
-        mock_session = MagicMock()
-        mock_session.get = MagicMock(return_value=mock_resp)
-
-        result = await _get_img_dims(mock_session, "https://example.com/1x1.png")
+        session = _FakeSession(_FakeResp(200, _PNG_1X1))
+        result = await _get_img_dims(session, "https://example.com/1x1.png")
         self.assertEqual(result, (1, 1), "Valid PNG header should yield (1, 1)")
 
+    async def test_range_request_partial_content_accepted(self) -> None:
+        """Only the header window is requested via Range; a 206 Partial Content reply is parsed."""
+        session = _FakeSession(_FakeResp(206, _PNG_1X1))
+        result = await _get_img_dims(session, "https://example.com/1x1.png")
+        self.assertEqual(result, (1, 1))
+        _, headers = session.requests[0]
+        self.assertTrue(headers["Range"].startswith("bytes=0-"))
+
+    async def test_unreadable_full_probe_retries_with_wider_range(self) -> None:
+        """A filled probe window that neither sniffing nor PIL can read triggers one wider fetch."""
+        session = _FakeSession(
+            _FakeResp(206, b"\xff\xd8\xff\xe1" + b"\x00" * 4092),
+            _FakeResp(206, _PNG_1X1),
+        )
+        result = await _get_img_dims(session, "https://example.com/exif.jpg")
+        self.assertEqual(result, (1, 1))
+        ranges = [headers["Range"] for _, headers in session.requests]
+        self.assertEqual(len(ranges), 2)
+        self.assertNotEqual(ranges[0], ranges[1], "Retry must ask for a wider window.")
+
+    async def test_probe_split_across_reads_is_reassembled(self) -> None:
+        """A probe delivered in several partial reads is still read in full; no retry, dims found."""
+        exif = b"Exif\x00\x00MM\x00*\x00\x00\x00\x08\x00\x00" + b"\x00" * 1500
+        jpeg = _encode_image("JPEG", (1200, 1200), exif=exif)
+        session = _FakeSession(_FakeResp(206, jpeg[:2048], chunk_size=700))
+        result = await _get_img_dims(session, "https://example.com/exif.jpg")
+        self.assertEqual(result, (1200, 1200))
+        self.assertEqual(len(session.requests), 1)
+
     async def test_returns_none_on_404(self) -> None:
         """Request that raises (e.g. 404) should return None, not propagate."""
-        mock_session = MagicMock()
-        mock_session.get = MagicMock(
-            side_effect=aiohttp.ClientResponseError(
+        session = _FakeSession(
+            aiohttp.ClientResponseError(
                 request_info=MagicMock(),
                 history=(),
                 status=404,
                 message="Not Found",
             )
         )
-        result = await _get_img_dims(mock_session, "https://example.com/missing.jpg")
+        result = await _get_img_dims(session, "https://example.com/missing.jpg")
         self.assertIsNone(result, "404 should be handled gracefully with None")
 
     async def test_returns_none_on_non_200_status(self) -> None:
         """Any non-200 status (e.g. 500) must return None, not parse body."""
-        mock_resp = AsyncMock()
-        mock_resp.status = 500
-        mock_resp.content = MagicMock()
-        mock_resp.content.read = AsyncMock(return_value=b"")
-        mock_resp.__aenter__ = AsyncMock(return_value=mock_resp)
-        mock_resp.__aexit__ = AsyncMock(return_value=None)
-        mock_session = MagicMock()
-        mock_session.get = MagicMock(return_value=mock_resp)
-        result = await _get_img_dims(mock_session, "https://example.com/error.jpg")
+        session = _FakeSession(_FakeResp(500, _PNG_1X1))
+        result = await _get_img_dims(session, "https://example.com/error.jpg")
         self.assertIsNone(result, "Non-200 must return None without relying on body.")
 
     async def test_returns_none_for_corrupt_image_bytes(self) -> None:
         """Corrupt or non-image body should return None."""
-        mock_resp = AsyncMock()
-        mock_resp.status = 200
-        mock_resp.content = MagicMock()
-        mock_resp.content.read = AsyncMock(return_value=b"not an image")
-        mock_resp.__aenter__ = AsyncMock(return_value=mock_resp)
-        mock_resp.__aexit__ = AsyncMock(return_value=None)
+        session = _FakeSession(_FakeResp(200, b"not an image"))
+        result = await _get_img_dims(session, "https://example.com/fake.jpg")
+        self.assertIsNone(result, "Corrupt bytes should yield None")
+        self.assertEqual(len(session.requests), 1, "A short body is the whole file; no retry.")
 
-        mock_session = MagicMock()
-        mock_session.get = MagicMock(return_value=mock_resp)
 
-        result = await _get_img_dims(mock_session, "https://example.com/fake.jpg")
-        self.assertIsNone(result, "Corrupt bytes should yield None")
+# --- _sniff_dims ---
+
+
+def _encode_image(fmt: str, size: tuple[int, int] = (1200, 1000), **save_kwargs) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGBA" if fmt == "WEBP" else "RGB", size).save(buf, fmt, **save_kwargs)
+    return buf.getvalue()
+
+
+class TestSniffDims(unittest.TestCase):
+    """_sniff_dims: dimensions from fixed header offsets, using only the first few dozen bytes."""
+
+    def test_fixed_offset_formats(self) -> None:
+        cases = {
+            "png": _encode_image("PNG"),
+            "gif": _encode_image("GIF"),
+            "webp-lossy": _encode_image("WEBP", lossless=False),
+            "webp-lossless": _encode_image("WEBP", lossless=True),
+            "webp-extended": _encode_image("WEBP", exif=b"Exif\x00\x00MM\x00*\x00\x00\x00\x08\x00\x00"),
+        }
+        for name, data in cases.items():
+            with self.subTest(fmt=name):
+                self.assertEqual(_sniff_dims(data[:32]), (1200, 1000))
+
+    def test_jpeg_frame_size_found_past_metadata_segments(self) -> None:
+        exif = b"Exif\x00\x00MM\x00*\x00\x00\x00\x08\x00\x00" + b"\x00" * 3000
+        cases = {
+            "baseline": _encode_image("JPEG"),
+            "progressive": _encode_image("JPEG", progressive=True),
+            "exif": _encode_image("JPEG", exif=exif),
+        }
+        for name, data in cases.items():
+            with self.subTest(kind=name):
+                self.assertEqual(_sniff_dims(data), (1200, 1000))
+        # Frame header beyond the bytes we have: let the caller fetch more or fall back.
+        self.assertIsNone(_sniff_dims(cases["exif"][:2048]))
+
+    def test_unknown_or_truncated_returns_none(self) -> None:
+        self.assertIsNone(_sniff_dims(b"not an image"))
+        self.assertIsNone(_sniff_dims(_encode_image("PNG")[:20]))
 
 
 # --- Integration (optional; skip until full pipeline works) ---
@@ -617,15 +761,21 @@ class TestCheckSingleImage(unittest.IsolatedAsyncioTestCase):
 class TestImageProcessorIntegration(unittest.IsolatedAsyncioTestCase):
     """Run extract_image_urls against real data files if present."""
 
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Read each fixture once per class rather than once per test.
+        data_dir = Path(__file__).resolve().parent.parent / "data"
+        cls.docs = {
+            name: (data_dir / name).read_bytes()
+            for name in ("article.html", "nike.html", "llbean.html")
+            if (data_dir / name).exists()
+        }
+
     def test_data_dir_extract_urls(self) -> None:
         """Parse data/article.html and assert non-empty URL list when images exist."""
-        data_dir = Path(__file__).resolve().parent.parent / "data"
-        for name in ("article.html", "nike.html", "llbean.html"):
-            path = data_dir / name
-            if not path.exists():
-                continue
+        for name, html in self.docs.items():
             with self.subTest(file=name):
-                out = extract_image_urls(path)
+                out = extract_image_urls_from_html(html)
                 self.assertIsInstance(out, list)
                 # Some product pages have images; allow empty for minimal pages
                 for url in out:
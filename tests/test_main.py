@@ -54,10 +54,12 @@ class TestMainSmoke(unittest.IsolatedAsyncioTestCase):
             if not p.exists():
                 self.skipTest(f"{p} not found")
         path_strs = [str(p) for p in paths]
-        mock_ai.side_effect = [
-            _make_product(name="First"),
-            _make_product(name="Second"),
-        ]
+        # The pipelines run concurrently, so answer by page rather than by call order.
+        async def respond(model, messages, text_format):
+            prompt = messages[0]["content"]
+            return _make_product(name="First" if "Pilar Floor Lamp" in prompt else "Second")
+
+        mock_ai.side_effect = respond
 
         from main import run_all_pipelines
 